@@ -1,13 +1,36 @@
 """ Test suite shared objects and setup """
 import os
 from glob import glob
+from shutil import copytree
+from tempfile import TemporaryDirectory
+from time import time_ns
 
 import pytest
 
+SRC_DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+SHM_PATH = "/dev/shm"
+
+
+@pytest.fixture
+def data_path(tmp_path_factory):
+    """
+    Copy of the test data in a temporary directory, which is memory-backed
+    if available, so tests are isolated and don't wait for disk
+    """
+    if os.path.isdir(SHM_PATH) and os.access(SHM_PATH, os.W_OK):
+        with TemporaryDirectory(dir=SHM_PATH) as d:
+            yield copytree(SRC_DATA_PATH, os.path.join(d, "data"))
+    else:
+        yield copytree(SRC_DATA_PATH, str(tmp_path_factory.mktemp("data") / "data"))
+
 
 @pytest.fixture
-def data_path():
-    return os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+def settled_clock(monkeypatch):
+    """
+    Clock far enough ahead that files written by the tests are not considered
+    recently modified, so they are cached
+    """
+    monkeypatch.setattr("yacman.yacman.time_ns", lambda: time_ns() + 10 ** 12)
 
 
 @pytest.fixture
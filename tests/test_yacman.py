@@ -1,26 +1,70 @@
 import os
+import pickle
+from glob import glob
 
 import pytest
+import yaml
 from jsonschema.exceptions import ValidationError
 
 import yacman
-from yacman.const import FILEPATH_KEY, IK, RO_KEY
+from yacman.const import FILEPATH_KEY, IK, INTERNAL_ONLY_KEYS, RO_KEY, SCHEMA_KEY
 
 
 class TestWriting:
     def test_basic_write(self, cfg_file, list_locks, data_path, locked_cfg_file):
         yacmap = yacman.YacAttMap(filepath=cfg_file, writable=True)
-        assert os.path.exists(locked_cfg_file)
+        assert os.path.basename(locked_cfg_file) in dir_entries(data_path)
         yacmap.write()
 
     def test_write_creates_file(self, data_path, list_locks):
         with pytest.warns(UserWarning):
             yacmap = yacman.YacAttMap(entries={}, writable=True)
         yacmap.write(filepath=make_cfg_file_path("writeout.yaml", data_path))
-        assert os.path.exists(make_lock_path("writeout.yaml", data_path))
-        assert os.path.exists(make_cfg_file_path("writeout.yaml", data_path))
+        entries = dir_entries(data_path)
+        assert yacman.LOCK_PREFIX + "writeout.yaml" in entries
+        assert "writeout.yaml" in entries
         os.remove(make_cfg_file_path("writeout.yaml", data_path))
 
+    @pytest.mark.parametrize("fsync_dir", [True, False])
+    def test_write_replaces_file(self, data_path, fsync_dir):
+        filepath = make_cfg_file_path("replaced.yaml", data_path)
+        with open(filepath, "w") as f:
+            f.write("testattr: testval\n")
+        os.chmod(filepath, 0o600)
+        yacmap = yacman.YacAttMap(filepath=filepath, writable=True)
+        yacmap.testattr = "testval_changed"
+        yacmap.write(fsync_dir=fsync_dir)
+        yacmap.make_readonly()
+        assert yacman.load_yaml(filepath) == {"testattr": "testval_changed"}
+        assert os.stat(filepath).st_mode & 0o777 == 0o600
+        assert not glob(os.path.join(data_path, "*.tmp"))
+
+    @pytest.mark.skipif(
+        not hasattr(os, "geteuid") or os.geteuid() != 0, reason="requires root"
+    )
+    def test_write_keeps_ownership(self, data_path):
+        filepath = make_cfg_file_path("owned.yaml", data_path)
+        with open(filepath, "w") as f:
+            f.write("testattr: testval\n")
+        os.chown(filepath, 1, 1)
+        yacmap = yacman.YacAttMap(entries={"testattr": "testval_changed"})
+        with pytest.warns(UserWarning):
+            yacmap.write(filepath=filepath)
+        yacmap.make_readonly()
+        st = os.stat(filepath)
+        assert (st.st_uid, st.st_gid) == (1, 1)
+
+    def test_write_creates_file_with_default_mode(self, data_path):
+        filepath = make_cfg_file_path("created.yaml", data_path)
+        umask = os.umask(0o022)
+        try:
+            yacmap = yacman.YacAttMap(entries={"testattr": "testval"})
+            yacmap.write(filepath=filepath)
+            yacmap.make_readonly()
+        finally:
+            os.umask(umask)
+        assert os.stat(filepath).st_mode & 0o777 == 0o644
+
     @pytest.mark.parametrize(
         ["name", "entry"], [("updated.yaml", "update"), ("updated1.yaml", "update1")]
     )
@@ -34,6 +78,22 @@ class TestWriting:
         assert yacmapin.test == entry
         os.remove(filepath)
 
+    @pytest.mark.parametrize("entry", ["x: y", "yes", "1", None, [1, "no"], {}])
+    def test_written_values_round_trip(self, data_path, entry):
+        filepath = make_cfg_file_path("roundtrip.yaml", data_path)
+        yacmap = yacman.YacAttMap(entries={"test": entry})
+        yacmap.write(filepath=filepath)
+        yacmap.make_readonly()
+        assert yacman.load_yaml(filepath) == {"test": entry}
+
+    @pytest.mark.parametrize("key", INTERNAL_ONLY_KEYS)
+    def test_internal_only_keys_written(self, data_path, key):
+        filepath = make_cfg_file_path("internal_keys.yaml", data_path)
+        yacmap = yacman.YacAttMap(entries={key: "testval", "other": 1})
+        yacmap.write(filepath=filepath)
+        yacmap.make_readonly()
+        assert yacman.load_yaml(filepath) == {key: "testval", "other": 1}
+
     @pytest.mark.parametrize("name", ["test.yaml", "test1.yaml"])
     def test_warn_on_write_when_not_locked(
         self, name, data_path, cfg_file, locked_cfg_file
@@ -45,8 +105,9 @@ class TestWriting:
         with pytest.warns(UserWarning):
             yacmap.write(filename)
         os.remove(filename)
-        assert os.path.exists(make_lock_path(name, data_path))
-        assert not os.path.exists(locked_cfg_file)
+        entries = dir_entries(data_path)
+        assert yacman.LOCK_PREFIX + name in entries
+        assert os.path.basename(locked_cfg_file) not in entries
 
 
 class TestExceptions:
@@ -99,14 +160,14 @@ class TestManipulationMethods:
     def test_make_writable_sets_filepath(self, name, data_path):
         yacmap = yacman.YacAttMap(entries={})
         yacmap.make_writable(make_cfg_file_path(name, data_path))
-        assert os.path.exists(make_lock_path(name, data_path))
+        assert yacman.LOCK_PREFIX + name in dir_entries(data_path)
         assert getattr(yacmap[IK], FILEPATH_KEY) is not None
 
     @pytest.mark.parametrize("name", ["test.yaml", "test1.yaml"])
     def test_make_writable_creates_locks(self, cfg_file, name, data_path):
         yacmap = yacman.YacAttMap(filepath=cfg_file, writable=False)
         yacmap.make_writable(make_cfg_file_path(name, data_path))
-        assert os.path.exists(make_lock_path(name, data_path))
+        assert yacman.LOCK_PREFIX + name in dir_entries(data_path)
 
     def test_make_writable_rereads_source_file(self, cfg_file):
         """
@@ -154,14 +215,14 @@ class TestReading:
         yacman.YacAttMap(filepath=cfg_file, skip_read_lock=True)
         yacmap.make_readonly()
 
-    def test_locking_is_opt_in(self, cfg_file, locked_cfg_file):
+    def test_locking_is_opt_in(self, cfg_file, locked_cfg_file, data_path):
         """
         this tests backwards compatibility, in the past the locking system did not exist.
         Consequently, to make yacman backwards compatible, multiple processes should be able to read and write to
         the file when no arguments but the intput are specified
         """
         yacman.YacAttMap(filepath=cfg_file)
-        assert not os.path.exists(locked_cfg_file)
+        assert os.path.basename(locked_cfg_file) not in dir_entries(data_path)
 
     def test_on_init_file_update(self, cfg_file):
         a, v = "testattr", "testval"
@@ -176,6 +237,111 @@ class TestReading:
         assert a in y
         os.remove(empty_file_path)
 
+    def test_read_lock_removed_on_parse_error(self, data_path):
+        filepath = make_cfg_file_path("invalid.yaml", data_path)
+        with open(filepath, "w") as f:
+            f.write("testattr: [testval\n")
+        with pytest.raises(yaml.YAMLError):
+            yacman.YacAttMap(filepath=filepath)
+        assert yacman.LOCK_PREFIX + "invalid.yaml" not in dir_entries(data_path)
+
+    def test_cache_file_used_and_updated(self, data_path, settled_clock):
+        filepath = make_cfg_file_path("cached.yaml", data_path)
+        with open(filepath, "w") as f:
+            f.write("testattr: testval\n")
+        assert yacman.YacAttMap(filepath=filepath, cache=True).testattr == "testval"
+        cache_files = glob(filepath + ".*" + yacman.CACHE_SUFFIX)
+        assert len(cache_files) == 1
+        # the sidecar is read instead of the file
+        with open(cache_files[0], "wb") as f:
+            pickle.dump({"testattr": "testval_cached"}, f)
+        yacman.yacman._YAML_CACHE.clear()
+        y = yacman.YacAttMap(filepath=filepath, cache=True)
+        assert y.testattr == "testval_cached"
+        with open(filepath, "w") as f:
+            f.write("testattr: testval_changed\n")
+        y = yacman.YacAttMap(filepath=filepath, cache=True)
+        assert y.testattr == "testval_changed"
+        new_cache_files = glob(filepath + ".*" + yacman.CACHE_SUFFIX)
+        assert len(new_cache_files) == 1 and new_cache_files != cache_files
+
+    def test_cache_file_has_config_mode(self, data_path, settled_clock):
+        filepath = make_cfg_file_path("private.yaml", data_path)
+        with open(filepath, "w") as f:
+            f.write("testattr: testval\n")
+        os.chmod(filepath, 0o600)
+        umask = os.umask(0o022)
+        try:
+            yacman.YacAttMap(filepath=filepath, cache=True)
+        finally:
+            os.umask(umask)
+        (cache_file,) = glob(filepath + ".*" + yacman.CACHE_SUFFIX)
+        assert os.stat(cache_file).st_mode & 0o777 == 0o600
+
+    def test_cache_update_keeps_other_files(self, data_path, settled_clock):
+        filepath = make_cfg_file_path("cached.yaml", data_path)
+        other_paths = [
+            filepath + ".2021.backup" + yacman.CACHE_SUFFIX,
+            filepath + ".v2.1.1" + yacman.CACHE_SUFFIX,
+        ]
+        for path in [filepath] + other_paths:
+            with open(path, "w") as f:
+                f.write("testattr: testval\n")
+        stale_path = filepath + ".1.1" + yacman.CACHE_SUFFIX
+        open(stale_path, "a").close()
+        yacman.YacAttMap(filepath=filepath, cache=True)
+        entries = dir_entries(data_path)
+        assert os.path.basename(stale_path) not in entries
+        assert all(os.path.basename(p) in entries for p in other_paths)
+
+    def test_cached_contents_not_affected_by_changes(self, cfg_file):
+        y = yacman.YacAttMap(filepath=cfg_file)
+        y.testattr = "testval"
+        assert "testattr" not in yacman.load_yaml(cfg_file)
+
+    def test_cached_nested_contents_not_affected_by_changes(
+        self, data_path, settled_clock
+    ):
+        filepath = make_cfg_file_path("nested.yaml", data_path)
+        with open(filepath, "w") as f:
+            f.write("testattr:\n  - testval\n")
+        yacman.YacAttMap(filepath=filepath).testattr.append("testval1")
+        assert yacman.YacAttMap(filepath=filepath).testattr == ["testval"]
+
+    def test_cached_omap_contents_not_affected_by_changes(
+        self, data_path, settled_clock
+    ):
+        filepath = make_cfg_file_path("omap.yaml", data_path)
+        with open(filepath, "w") as f:
+            f.write("testattr: !!omap\n  - a: {b: 1}\n")
+        yacman.load_yaml(filepath)["testattr"][0][1]["b"] = 2
+        assert yacman.load_yaml(filepath)["testattr"][0][1] == {"b": 1}
+
+    def test_changed_file_is_reread(self, data_path, settled_clock):
+        filepath = make_cfg_file_path("changed.yaml", data_path)
+        with open(filepath, "w") as f:
+            f.write("testattr: testval\n")
+        assert yacman.YacAttMap(filepath=filepath).testattr == "testval"
+        with open(filepath, "w") as f:
+            f.write("testattr: testval_changed\n")
+        assert yacman.YacAttMap(filepath=filepath).testattr == "testval_changed"
+
+    def test_recently_modified_file_not_cached(self, data_path, monkeypatch):
+        filepath = make_cfg_file_path("racy.yaml", data_path)
+        mtime_ns = os.stat(data_path).st_mtime_ns
+        for value in ["testval", "testvbl"]:
+            # same size and mtime, as after an in-place change within one
+            # timestamp tick on a file system with coarse timestamps
+            with open(filepath, "w") as f:
+                f.write(f"testattr: {value}\n")
+            os.utime(filepath, ns=(mtime_ns, mtime_ns))
+            monkeypatch.setattr("yacman.yacman.time_ns", lambda: mtime_ns + 10 ** 9)
+            assert yacman.YacAttMap(filepath=filepath, cache=True).testattr == value
+            assert not glob(filepath + ".*" + yacman.CACHE_SUFFIX)
+        monkeypatch.setattr("yacman.yacman.time_ns", lambda: mtime_ns + 3 * 10 ** 9)
+        yacman.YacAttMap(filepath=filepath, cache=True)
+        assert glob(filepath + ".*" + yacman.CACHE_SUFFIX)
+
 
 class TestContextManager:
     @pytest.mark.parametrize("state", [True, False])
@@ -215,6 +381,14 @@ class TestContextManager:
                 pass
 
 
+def test_internal_attributes_accept_custom_keys():
+    yacmap = yacman.YacAttMap(entries={})
+    setattr(yacmap[IK], "custom", "testval")
+    assert yacmap[IK]["custom"] == "testval"
+    assert yacmap[IK].to_dict()["custom"] == "testval"
+    assert "custom" not in yacmap
+
+
 yaml_str = """\
 ---
 one: 1
@@ -230,6 +404,13 @@ def test_float_idx():
         data[2]
 
 
+def test_libyaml_loader_not_patched():
+    if not hasattr(yaml, "CSafeLoader"):
+        pytest.skip("libyaml not available")
+    yacman.YacAttMap(yamldata=yaml_str)
+    assert yaml.load(yaml_str, Loader=yaml.CSafeLoader)[2] == "two"
+
+
 class TestSelectConfig:
     def test_select_config_works_with_filepath(self, cfg_file):
         assert isinstance(yacman.select_config(config_filepath=cfg_file), str)
@@ -264,6 +445,14 @@ class TestValidation:
         """test object that adheres to the schema guidelines passes validation"""
         yacman.YacAttMap(filepath=cfg_file, schema_source=schema)
 
+    def test_validator_reused_until_schema_replaced(self, cfg_file, schema):
+        y = yacman.YacAttMap(filepath=cfg_file, schema_source=schema)
+        validator = y._get_validator()
+        y.validate()
+        assert y._get_validator() is validator
+        setattr(y[IK], SCHEMA_KEY, {"type": "object"})
+        assert y._get_validator() is not validator
+
     @pytest.mark.parametrize("value", [1, 2, [1, 2, 3], {"test": 1}])
     def test_validation_fails_in_constructor(self, schema, value):
         """
@@ -283,6 +472,49 @@ class TestValidation:
         )
         y.write()
 
+    def test_validation_in_write_repeated_if_schema_replaced(self, cfg_file, schema):
+        """
+        test object is validated on write again if the bound schema was replaced
+        """
+        y = yacman.YacAttMap(
+            filepath=cfg_file, schema_source=schema, write_validate=True, writable=True
+        )
+        y.write()
+        setattr(y[IK], SCHEMA_KEY, {"type": "array"})
+        with pytest.raises(ValidationError):
+            y.write()
+
+    def test_validation_in_write_repeated_if_expanded_value_changed(
+        self, cfg_file, schema, monkeypatch
+    ):
+        """
+        test object is validated on write again if a value changed after path
+        expansion, even though the written contents did not
+        """
+        monkeypatch.setenv("YACMAN_TEST_VAR", "nowhitespace")
+        y = yacman.YacAttMap(
+            filepath=cfg_file, schema_source=schema, write_validate=True, writable=True
+        )
+        y["newattr"] = "$YACMAN_TEST_VAR"
+        y.write()
+        monkeypatch.setenv("YACMAN_TEST_VAR", "white space")
+        with pytest.raises(ValidationError):
+            y.write()
+
+    def test_validation_forced_in_write(self, cfg_file, schema, monkeypatch):
+        y = yacman.YacAttMap(
+            filepath=cfg_file, schema_source=schema, write_validate=True, writable=True
+        )
+        y.write()
+        validated = []
+        monkeypatch.setattr(
+            yacman.YacAttMap, "_validate_instance", lambda *a, **kw: validated.append(a)
+        )
+        y.write()
+        assert not validated
+        y.write(force_validate=True)
+        assert validated
+
     @pytest.mark.parametrize("value", [1, 2, [1, 2, 3], {"test": 1}])
     def test_validation_fails_in_write(self, cfg_file, schema, value):
         """
@@ -298,8 +530,12 @@ class TestValidation:
 
 
 def cleanup_locks(lcks):
-    if lcks:
-        [os.remove(l) for l in lcks]
+    for l in lcks or ():
+        os.unlink(l)
+
+
+def dir_entries(path):
+    return {e.name for e in os.scandir(path)}
 
 
 def make_cfg_file_path(name, data_path):
@@ -162,6 +162,9 @@ class TestAliases:
         assert len(set_al) > 0
         with pytest.raises(KeyError):
             x[alias]
+        assert x.get_aliases(key + "_new") == [alias]
+        with pytest.raises(yacman.UndefinedAliasError):
+            x.get_aliases(key)
 
     @pytest.mark.parametrize(
         ["entries", "aliases"],
@@ -1,6 +1,7 @@
 import logging
 from collections.abc import Mapping
 from inspect import getfullargspec
+from sys import intern
 from warnings import warn
 
 from .const import *
@@ -59,12 +60,12 @@ class AliasedYacAttMap(YacAttMap):
             wait_max=wait_max,
             skip_read_lock=skip_read_lock,
         )
-        setattr(self[IK], ALIASES_KEY_RAW, {})
+        raw_aliases = {}
         if not exact:
             if isinstance(aliases, Mapping) and is_aliases_mapping_valid(
                 aliases, aliases_strict
             ):
-                setattr(self[IK], ALIASES_KEY_RAW, aliases)
+                raw_aliases = aliases
             elif callable(aliases):
                 if len(getfullargspec(aliases).args) != 1:
                     _emit_msg(
@@ -84,7 +85,7 @@ class AliasedYacAttMap(YacAttMap):
                     )
                 else:
                     if is_aliases_mapping_valid(res):
-                        setattr(self[IK], ALIASES_KEY_RAW, res)
+                        raw_aliases = res
                     else:
                         _emit_msg(
                             aliases_strict,
@@ -95,12 +96,15 @@ class AliasedYacAttMap(YacAttMap):
             else:
                 _LOGGER.info("No aliases provided")
 
-        # convert the original, condensed mapping to a data structure with
-        # optimal time complexity
-        setattr(self[IK], ALIASES_KEY, {})
-        for k, v in self[IK][ALIASES_KEY_RAW].items():
+        # convert the original, condensed mapping to data structures with
+        # optimal time complexity: alias-key and key-aliases lookups
+        internal = self[IK]
+        setattr(internal, ALIASES_KEY_RAW, raw_aliases)
+        setattr(internal, ALIASES_KEY, {})
+        setattr(internal, ALIASES_KEY_REVERSE, {})
+        for k, v in raw_aliases.items():
             for alias in v:
-                self[IK][ALIASES_KEY][alias] = k
+                self._add_alias(alias, k)
 
     def __getitem__(self, item, expand=True, to_dict=False):
         """
@@ -108,19 +112,20 @@ class AliasedYacAttMap(YacAttMap):
         key. If the key is not defined in the object it will try to access the
         key by it's alias, if defined. If both fail, a KeyError is raised.
         """
-        try:
+        # explicit membership checks are used instead of catching the KeyError
+        # raised by the parent method, which is costly on this hot path.
+        # Items are stored in the underlying dict, attributes in __dict__
+        attrs = self.__dict__
+        if dict.__contains__(self, item) or item in attrs:
             return super(AliasedYacAttMap, self).__getitem__(
                 item=item, expand=expand, to_dict=to_dict
             )
-        except KeyError:
-            try:
-                key = self.get_key(item)
-            except UndefinedAliasError:
-                raise KeyError(item)
-            else:
-                return super(AliasedYacAttMap, self).__getitem__(
-                    item=key, expand=expand, to_dict=to_dict
-                )
+        aliases = getattr(attrs.get(IK), ALIASES_KEY, None)
+        if not aliases or item not in aliases:
+            raise KeyError(item)
+        return super(AliasedYacAttMap, self).__getitem__(
+            item=aliases[item], expand=expand, to_dict=to_dict
+        )
 
     def __contains__(self, key):
         """
@@ -128,22 +133,14 @@ class AliasedYacAttMap(YacAttMap):
         If the key is not defined in the object it will try to use its alias.
         If both fail, a negative decision is returned; otherwise -- positive.
         """
-        try:
-            self.__getitem__(key, expand=False)
-        except (UndefinedAliasError, KeyError):
-            try:
-                alias_key = self.get_key(key)
-            except (UndefinedAliasError, KeyError):
-                return False
-            else:
-                try:
-                    self.__getitem__(alias_key, expand=False)
-                except (UndefinedAliasError, KeyError):
-                    return False
-                else:
-                    return True
-        else:
+        # same membership checks as in __getitem__, without value retrieval
+        attrs = self.__dict__
+        if dict.__contains__(self, key) or key in attrs:
             return True
+        aliases = getattr(attrs.get(IK), ALIASES_KEY, None)
+        if not aliases or key not in aliases:
+            return False
+        return dict.__contains__(self, aliases[key]) or aliases[key] in attrs
 
     def __delitem__(self, key):
         """
@@ -192,12 +189,9 @@ class AliasedYacAttMap(YacAttMap):
         :raise UndefinedAliasError: if no alias has been defined for the
             requested key
         """
-        aliases = []
-        for a, k in self[IK][ALIASES_KEY].items():
-            if k == key:
-                aliases.append(a)
+        aliases = self[IK][ALIASES_KEY_REVERSE].get(key)
         if aliases:
-            return aliases
+            return list(aliases)
         raise UndefinedAliasError("No alias defined for: {}".format(key))
 
     def get_key(self, alias):
@@ -211,17 +205,15 @@ class AliasedYacAttMap(YacAttMap):
         :raise UndefinedAliasError: if a no key has been defined for the
             requested alias
         """
+        # the __internal key is looked up directly rather than with __getitem__,
+        # which would otherwise end up in an infinite recursion loop
+        internal = self.__dict__.get(IK)
+        if internal is None:
+            raise UndefinedAliasError()
         try:
-            # first try to use the parent method (doesn't try to use aliases) to
-            # check if the __internal key is defined.
-            # Otherwise we would end up in an infinite recursion loop.
-            super(AliasedYacAttMap, self).__getitem__(item=IK, expand=False)
+            return internal[ALIASES_KEY][alias]
         except KeyError:
-            # raise UndefinedAliasError, which is caught in the updated __getitem__ method
-            raise UndefinedAliasError()
-        if alias in self[IK][ALIASES_KEY].keys():
-            return self[IK][ALIASES_KEY][alias]
-        raise UndefinedAliasError("No key defined for: {}".format(alias))
+            raise UndefinedAliasError("No key defined for: {}".format(alias))
 
     def set_aliases(self, key, aliases, overwrite=False, reset_key=False):
         """
@@ -243,17 +235,17 @@ class AliasedYacAttMap(YacAttMap):
                 pass
             else:
                 for a in current_aliases:
-                    del self[IK][ALIASES_KEY][a]
+                    self._remove_alias(a)
                     removed_aliases.append(a)
 
         set_aliases = []
         for alias in _make_list_of_aliases(aliases):
             if alias in self[IK][ALIASES_KEY]:
                 if overwrite:
-                    self[IK][ALIASES_KEY][alias] = key
+                    self._add_alias(alias, key)
                     set_aliases.append(alias)
             else:
-                self[IK][ALIASES_KEY][alias] = key
+                self._add_alias(alias, key)
                 set_aliases.append(alias)
         _LOGGER.debug("Added aliases ({}: {})".format(key, set_aliases))
         return set_aliases, removed_aliases
@@ -279,10 +271,39 @@ class AliasedYacAttMap(YacAttMap):
                 else current_aliases
             )
             for alias in existing_aliases:
-                del self[IK][ALIASES_KEY][alias]
+                self._remove_alias(alias)
                 removed.append(alias)
             return removed
 
+    def _add_alias(self, alias, key):
+        """
+        Bind an alias to a key in both the alias-key and key-aliases mappings
+
+        If the alias is already bound to a key, it is rebound.
+
+        :param str alias: alias to bind
+        :param str key: key to bind the alias to
+        """
+        internal = self[IK]
+        if alias in internal[ALIASES_KEY]:
+            self._remove_alias(alias)
+        alias, key = _intern(alias), _intern(key)
+        internal[ALIASES_KEY][alias] = key
+        internal[ALIASES_KEY_REVERSE].setdefault(key, []).append(alias)
+
+    def _remove_alias(self, alias):
+        """
+        Unbind an alias from both the alias-key and key-aliases mappings
+
+        :param str alias: alias to unbind
+        """
+        internal = self[IK]
+        key = internal[ALIASES_KEY].pop(alias)
+        key_aliases = internal[ALIASES_KEY_REVERSE][key]
+        key_aliases.remove(alias)
+        if not key_aliases:
+            del internal[ALIASES_KEY_REVERSE][key]
+
 
 def is_aliases_mapping_valid(aliases, strictness=None):
     """
@@ -325,6 +346,17 @@ def _make_list_of_aliases(aliases):
     return aliases
 
 
+def _intern(s):
+    """
+    Intern a string, so that its copies in the aliases mappings are shared
+    and compared by identity in lookups
+
+    :param str s: string to intern; other objects are returned as is
+    :return str: interned string
+    """
+    return intern(s) if type(s) is str else s
+
+
 def _emit_msg(strictness, msg):
     """
     Emit a message based on the selected strictness level
@@ -11,8 +11,11 @@ ORI_STATE_KEY = "ori_state"
 WAIT_MAX_KEY = "wait_time"
 ALIASES_KEY = "aliases"
 ALIASES_KEY_RAW = "aliases_raw"
+ALIASES_KEY_REVERSE = "aliases_reverse"
 WRITE_VALIDATE_KEY = "write_validate"
 SCHEMA_KEY = "schema"
+VALIDATOR_KEY = "validator"
+VALIDATED_DIGEST_KEY = "validated_digest"
 
 ATTR_KEYS = (
     IK,
@@ -27,6 +30,10 @@ ATTR_KEYS = (
     SCHEMA_KEY,
 )
 
+# keys only ever stored in the internal attributes, never excluded from the data
+INTERNAL_ONLY_KEYS = (ALIASES_KEY_REVERSE, VALIDATOR_KEY, VALIDATED_DIGEST_KEY)
+
 LOCK_PREFIX = "lock."
+CACHE_SUFFIX = ".cache"
 DEFAULT_RO = False
 DEFAULT_WAIT_TIME = 60
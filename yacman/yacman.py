@@ -1,20 +1,45 @@
 import logging
 import os
+import pickle
+import re
 import warnings
-from collections.abc import Iterable
+from collections import OrderedDict
+from collections.abc import Iterable, MutableMapping
+from hashlib import blake2b
+from stat import S_IMODE, S_ISREG
 from sys import _getframe
+from tempfile import mkstemp
+from threading import Lock
+from time import time_ns
 from warnings import warn
 
 import attmap
 import oyaml as yaml
 from jsonschema import validate as _validate
-from jsonschema.exceptions import ValidationError
+from jsonschema.exceptions import ValidationError, best_match
+from jsonschema.validators import validator_for
 from ubiquerg import create_lock, expandpath, is_url, make_lock_path, mkabs, remove_lock
 
 from .const import *
 
+try:
+    from yaml import CSafeDumper as _SafeDumper
+    from yaml import CSafeLoader as _SafeLoader
+except ImportError:
+    from yaml import SafeDumper as _SafeDumper
+    from yaml import SafeLoader as _SafeLoader
+
 _LOGGER = logging.getLogger(__name__)
 
+# process-wide cache of parsed YAML files, see read_yaml_file in load_yaml
+_YAML_CACHE = OrderedDict()
+_YAML_CACHE_SIZE = 100
+_YAML_CACHE_LOCK = Lock()
+_CACHE_MISS = object()
+# files modified less than this long ago are not cached, since a same-size
+# change within the timestamp granularity of the file system would go unnoticed
+_RACY_WINDOW_NS = 2 * 10 ** 9
+
 # Hack for string indexes of both ordered and unordered yaml representations
 # Credit: Anthon
 # https://stackoverflow.com/questions/50045617
@@ -63,6 +88,87 @@ if sys.version_info < (3, 7):
 # End hack
 
 
+class _YacmanLoader(_SafeLoader):
+    """
+    Safe loader used by yacman, which keeps numeric keys as strings
+
+    The libyaml-based loader is used if available, since it is much faster.
+    It is subclassed rather than patched, so other users of it are not affected.
+    """
+
+    def construct_mapping(self, node, deep=False):
+        data = super(_YacmanLoader, self).construct_mapping(node, deep)
+        return {
+            (str(key) if isinstance(key, float) or isinstance(key, int) else key): data[
+                key
+            ]
+            for key in data
+        }
+
+    if sys.version_info < (3, 7):
+        construct_pairs = my_construct_pairs
+
+
+_INTERNAL_SLOTS = tuple(k for k in ATTR_KEYS + INTERNAL_ONLY_KEYS if k != IK)
+
+
+class _InternalAttributes(MutableMapping):
+    """
+    Container for the meta attributes of a YacAttMap object, stored under IK.
+
+    The attributes used by yacman are slots, so reading them, also when they
+    are not set, is as cheap as reading a regular attribute. Any other
+    attributes, e.g. set by subclasses, are stored in the instance __dict__.
+    Both kinds are available with attribute and item access.
+    """
+
+    __slots__ = _INTERNAL_SLOTS + ("__dict__",)
+
+    def __getitem__(self, item):
+        if item in _INTERNAL_SLOTS:
+            try:
+                return getattr(self, item)
+            except AttributeError:
+                raise KeyError(item)
+        return self.__dict__[item]
+
+    def __setitem__(self, key, value):
+        if key in _INTERNAL_SLOTS:
+            setattr(self, key, value)
+        else:
+            self.__dict__[key] = value
+
+    def __delitem__(self, key):
+        if key in _INTERNAL_SLOTS:
+            try:
+                delattr(self, key)
+            except AttributeError:
+                raise KeyError(key)
+        else:
+            del self.__dict__[key]
+
+    def __iter__(self):
+        for k in _INTERNAL_SLOTS:
+            if hasattr(self, k):
+                yield k
+        yield from self.__dict__
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        attrs = ", ".join(f"{k}={v!r}" for k, v in self.items())
+        return f"{self.__class__.__name__}({attrs})"
+
+    def to_dict(self):
+        """
+        Return a builtin dict representation of this object
+
+        :return dict: attributes of this object
+        """
+        return dict(self.items())
+
+
 class YacAttMap(attmap.PathExAttMap):
     """
     A class that extends AttMap to provide yaml reading and race-free
@@ -88,6 +194,7 @@ class YacAttMap(attmap.PathExAttMap):
         skip_read_lock=False,
         schema_source=None,
         write_validate=False,
+        cache=False,
     ):
         """
         Object constructor
@@ -107,6 +214,9 @@ class YacAttMap(attmap.PathExAttMap):
         :param bool write_validate: a boolean indicating whether the object should be
             validated every time the `write` method is executed, which is
             a way of preventing invalid config writing
+        :param bool cache: whether to keep the parsed contents of the file in
+            a pickled sidecar file, which is read instead of the file as long
+            as the file is not modified. See `load_yaml` for caveats
         """
         if writable:
             if filepath:
@@ -120,10 +230,14 @@ class YacAttMap(attmap.PathExAttMap):
         if filepath:
             if not skip_read_lock and not writable and os.path.exists(filepath):
                 create_lock(filepath, wait_max)
-                file_contents = load_yaml(filepath)
-                remove_lock(filepath)
+                try:
+                    file_contents = load_yaml(filepath, cache=cache)
+                finally:
+                    # don't leave a stale read lock behind if the file is not
+                    # readable or parsable, others would wait for it in vain
+                    remove_lock(filepath)
             else:
-                file_contents = load_yaml(filepath)
+                file_contents = load_yaml(filepath, cache=cache)
             if entries:
                 if file_contents is None:
                     # if file is empty, initialize its contents to an empty dict
@@ -131,9 +245,9 @@ class YacAttMap(attmap.PathExAttMap):
                 file_contents.update(entries)
             entries = file_contents
         elif yamldata:
-            entries = yaml.load(yamldata, yaml.SafeLoader)
+            entries = yaml.load(yamldata, _YacmanLoader)
         if not hasattr(self, IK):
-            setattr(self, IK, attmap.AttMap())
+            setattr(self, IK, _InternalAttributes())
         super(YacAttMap, self).__init__(entries or {})
         if filepath:
             # to make this python2 compatible, the attributes need to be set here.
@@ -157,6 +271,9 @@ class YacAttMap(attmap.PathExAttMap):
             self.validate()
 
     def __del__(self):
+        if IK not in self.__dict__:
+            # object construction failed before the internal attributes were set
+            return
         if hasattr(self[IK], FILEPATH_KEY) and not getattr(self[IK], RO_KEY, True):
             self.make_readonly()
 
@@ -193,6 +310,29 @@ class YacAttMap(attmap.PathExAttMap):
         else:
             self.__init__(entries={}, skip_read_lock=True)
 
+    def to_yaml(self, trailing_newline=True):
+        """
+        Get text for YAML representation
+
+        The contents are serialized with the libyaml-based dumper, if available.
+        Objects that the safe dumper can't represent are rendered by attmap.
+
+        :param bool trailing_newline: whether to add trailing newline
+        :return str: YAML text representation of this object
+        """
+        data = self._simplify_keyvalue(self._data_for_repr(), dict)
+        try:
+            text = yaml.dump(
+                data,
+                Dumper=_SafeDumper,
+                default_flow_style=False,
+                allow_unicode=True,
+            )
+        except yaml.representer.RepresenterError as e:
+            _LOGGER.debug(f"Falling back to attmap YAML rendering: {e}")
+            return super(YacAttMap, self).to_yaml(trailing_newline=trailing_newline)
+        return text if trailing_newline else text.rstrip("\n")
+
     def _excl_from_repr(self, k, cls):
         return k in ATTR_KEYS
 
@@ -205,15 +345,32 @@ class YacAttMap(attmap.PathExAttMap):
         """
         Validate the object against a schema
 
+        :param dict schema: a schema object to use to validate, it overrides the one
+            that has been provided at object construction stage
+        :param bool exclude_case: whether to exclude validated objects
+            from the error. Useful when used with large configs
+        """
+        self._validate_instance(
+            self.to_dict(expand=True), schema=schema, exclude_case=exclude_case
+        )
+
+    def _validate_instance(self, instance, schema=None, exclude_case=False):
+        """
+        Validate the object data against a schema
+
+        :param dict instance: the expanded object data to validate
         :param dict schema: a schema object to use to validate, it overrides the one
             that has been provided at object construction stage
         :param bool exclude_case: whether to exclude validated objects
             from the error. Useful when used with large configs
         """
         try:
-            _validate(
-                self.to_dict(expand=True), schema or getattr(self[IK], SCHEMA_KEY)
-            )
+            if schema:
+                _validate(instance, schema)
+            else:
+                error = best_match(self._get_validator().iter_errors(instance))
+                if error is not None:
+                    raise error
         except ValidationError as e:
             _LOGGER.error(
                 f"{self.__class__.__name__} object did not pass schema validation"
@@ -230,15 +387,49 @@ class YacAttMap(attmap.PathExAttMap):
             )
         _LOGGER.debug("Validated successfully")
 
-    def write(self, filepath=None, schema=None, exclude_case=False):
+    def _get_validator(self):
+        """
+        Get a validator for the schema provided at object construction stage
+
+        The validator is created once and reused, unless the schema is replaced.
+
+        :return jsonschema.protocols.Validator: validator for the schema
+        """
+        schema = getattr(self[IK], SCHEMA_KEY)
+        validator = getattr(self[IK], VALIDATOR_KEY, None)
+        if validator is None or validator.schema is not schema:
+            cls = validator_for(schema)
+            cls.check_schema(schema)
+            validator = cls(schema)
+            setattr(self[IK], VALIDATOR_KEY, validator)
+        return validator
+
+    def write(
+        self,
+        filepath=None,
+        schema=None,
+        exclude_case=False,
+        durable=True,
+        fsync_dir=False,
+        force_validate=False,
+    ):
         """
         Write the contents to a file.
 
-        Make sure that the object has been created with write capabilities
+        Make sure that the object has been created with write capabilities.
+        The contents are written to a temporary file first, which then replaces
+        the target file, so the file is never left partially written.
 
         :param str filepath: a file path to write to
         :param dict schema: a schema object to use to validate, it overrides the one
             that has been provided at object construction stage
+        :param bool durable: whether to flush the written file to disk before
+            it replaces the target file
+        :param bool fsync_dir: whether to flush the directory containing the file
+            to disk, so that the replacement itself survives a system crash
+        :param bool force_validate: whether to validate the object against the
+            schema provided at object construction stage even if the contents
+            have not changed since the last successful validation on write
         :raise OSError: when the object has been created in a read only mode or other
             process has locked the file
         :raise TypeError: when the filepath cannot be determined. This takes place only
@@ -251,8 +442,33 @@ class YacAttMap(attmap.PathExAttMap):
             raise OSError(
                 "You can't call write on an object that was created in read-only mode."
             )
-        if schema is not None or getattr(self[IK], WRITE_VALIDATE_KEY):
+        yaml_bytes = self.to_yaml().encode("utf-8")
+        if schema is not None:
             self.validate(schema=schema, exclude_case=exclude_case)
+        elif getattr(self[IK], WRITE_VALIDATE_KEY):
+            # skip the validation if the same data passed it against the same
+            # schema in a previous write
+            instance = self.to_dict(expand=True)
+            validator = self._get_validator()
+            try:
+                digest = blake2b(
+                    pickle.dumps(instance, pickle.HIGHEST_PROTOCOL), digest_size=16
+                ).digest()
+            except Exception:
+                # not picklable, always validate
+                digest = None
+            last = getattr(self[IK], VALIDATED_DIGEST_KEY, None)
+            if (
+                force_validate
+                or digest is None
+                or last is None
+                or last[0] is not validator
+                or last[1] != digest
+            ):
+                self._validate_instance(instance, exclude_case=exclude_case)
+                setattr(self[IK], VALIDATED_DIGEST_KEY, (validator, digest))
+            else:
+                _LOGGER.debug("Contents not changed since last validation")
         filepath = _check_filepath(filepath or getattr(self[IK], FILEPATH_KEY, None))
         lock = make_lock_path(filepath)
         if filepath != getattr(self[IK], FILEPATH_KEY, None):
@@ -271,8 +487,7 @@ class YacAttMap(attmap.PathExAttMap):
             setattr(self[IK], FILEPATH_KEY, filepath)
             create_lock(filepath, getattr(self[IK], WAIT_MAX_KEY, DEFAULT_WAIT_TIME))
         setattr(self[IK], RO_KEY, False)
-        with open(filepath, "w") as f:
-            f.write(self.to_yaml())
+        _write_atomic(filepath, yaml_bytes, durable=durable, fsync_dir=fsync_dir)
         abs_path = os.path.abspath(filepath)
         _LOGGER.debug(f"Wrote to a file: {abs_path}")
         return os.path.abspath(abs_path)
@@ -287,10 +502,11 @@ class YacAttMap(attmap.PathExAttMap):
         :return bool: whether the lock was found and removed
         """
         lock = make_lock_path(_check_filepath(filepath))
-        if os.path.exists(lock):
+        try:
             os.remove(lock)
-            return True
-        return False
+        except FileNotFoundError:
+            return False
+        return True
 
     def make_readonly(self):
         """
@@ -404,19 +620,250 @@ def _check_filepath(filepath):
     return filepath
 
 
-def load_yaml(filepath):
-    """Load a yaml file into a python dict"""
+def _get_umask():
+    """
+    Get the file mode creation mask of the process
+
+    Read from /proc where available, since setting and restoring the umask
+    is not thread-safe
+
+    :return int: umask of the process
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("Umask:"):
+                    return int(line.split()[1], 8)
+    except OSError:
+        pass
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+def _copy_ownership(filepath, st):
+    """
+    Give a file the owner and group of another one, as far as permitted
+
+    Only privileged processes can change the owner, so if that fails, only the
+    group is changed, which is allowed to any member of the group.
+
+    :param str filepath: path to the file to change the ownership of
+    :param os.stat_result st: stats of the file to copy the ownership of
+    """
+    if not hasattr(os, "chown"):
+        return
+    for uid in (st.st_uid, -1):
+        try:
+            os.chown(filepath, uid, st.st_gid)
+            return
+        except PermissionError:
+            pass
+    _LOGGER.debug(f"Could not change the ownership of '{filepath}'")
+
+
+def _write_atomic(filepath, data, durable=True, fsync_dir=False, mode=None):
+    """
+    Write data to a file by replacing it with a fully written temporary file
+
+    :param str filepath: path to the file to write
+    :param bytes data: data to write
+    :param bool durable: whether to fsync the temporary file before the
+        replacement
+    :param bool fsync_dir: whether to fsync the parent directory after the
+        replacement. Not supported by some file systems, e.g. SMB, in which
+        case this is skipped
+    :param int mode: permission bits of the file if it does not exist yet.
+        Defaults to the ones open(filepath, "w") would use
+    """
+    # replace the symlink target rather than the link itself
+    filepath = os.path.realpath(filepath)
+    fd, tmp = mkstemp(
+        dir=os.path.dirname(filepath),
+        prefix=os.path.basename(filepath) + ".",
+        suffix=".tmp",
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            if durable:
+                f.flush()
+                os.fsync(fd)
+        # mkstemp creates the file with mode 0o600, so apply the mode and,
+        # as far as permitted, the ownership of the replaced file, or the mode
+        # open(filepath, "w") would use
+        try:
+            st = os.stat(filepath)
+        except FileNotFoundError:
+            if mode is None:
+                mode = 0o666 & ~_get_umask()
+        else:
+            mode = S_IMODE(st.st_mode)
+            _copy_ownership(tmp, st)
+        os.chmod(tmp, mode)
+        os.replace(tmp, filepath)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+    if fsync_dir and hasattr(os, "O_DIRECTORY"):
+        try:
+            dir_fd = os.open(os.path.dirname(filepath), os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+        except OSError as e:
+            _LOGGER.debug(f"Could not fsync directory of '{filepath}': {e}")
+
+
+def _copy_parsed(data, memo=None):
+    """
+    Copy data produced by a YAML safe loader
+
+    Only the containers (dicts, lists and sets) are copied, since all the other
+    objects a safe loader constructs are immutable, except for tuples: !!omap
+    and !!pairs are built as lists of tuples, which may hold containers. Tuples
+    are rebuilt only if any of their elements was copied. This is much faster
+    than copy.deepcopy, which dispatches on type and memoizes every object.
+    Shared and recursive containers (YAML anchors and aliases) are preserved.
+
+    :param object data: data to copy
+    :param dict memo: copies of the containers already copied, by their id
+    :return object: copied data
+    """
+    cls = type(data)
+    if cls is not dict and cls is not list and cls is not set and cls is not tuple:
+        return data
+    if memo is None:
+        memo = {}
+    try:
+        return memo[id(data)]
+    except KeyError:
+        pass
+    if cls is set:
+        # set elements are hashable, so not containers that need copying
+        res = memo[id(data)] = set(data)
+    elif cls is tuple:
+        items = [_copy_parsed(v, memo) for v in data]
+        if all(c is v for c, v in zip(items, data)):
+            res = data
+        else:
+            res = tuple(items)
+        memo[id(data)] = res
+    elif cls is dict:
+        res = memo[id(data)] = {}
+        for k, v in data.items():
+            res[k] = _copy_parsed(v, memo)
+    else:
+        res = memo[id(data)] = []
+        for v in data:
+            res.append(_copy_parsed(v, memo))
+    return res
+
+
+def load_yaml(filepath, cache=False):
+    """
+    Load a yaml file into a python dict
+
+    :param str filepath: path or a URL to the file to read
+    :param bool cache: whether to keep the parsed contents of a local file in
+        a pickled sidecar file, which is read instead of the file as long as the
+        file is not modified. Pickles can execute arbitrary code when loaded,
+        so use this only in directories that untrusted users can't write to.
+    :return dict: read data
+    """
+
+    def parse_yaml_file(filepath, st):
+        """
+        Parse a YAML file
+
+        The file is read in binary mode, so that libyaml decodes it directly.
+
+        :param str filepath: path to the file to read
+        :param os.stat_result st: stats of the file to read
+        :return dict: read data
+        """
+        if st.st_size == 0 and S_ISREG(st.st_mode):
+            # nothing to parse, the loader would return None as well
+            return None
+        with open(filepath, "rb") as f:
+            return yaml.load(f, _YacmanLoader)
+
+    def read_cache_file(filepath, st):
+        """
+        Read a YAML file via its pickled sidecar, which is created if missing
+
+        :param str filepath: path to the file to read
+        :param os.stat_result st: stats of the file to read
+        :return dict: read data
+        """
+        cache_path = f"{filepath}.{st.st_size}.{st.st_mtime_ns}{CACHE_SUFFIX}"
+        try:
+            with open(cache_path, "rb") as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            _LOGGER.debug(f"Could not read cache file '{cache_path}': {e}")
+        data = parse_yaml_file(filepath, st)
+        try:
+            # only remove the sidecars of this file, named like cache_path
+            dirpath, basename = os.path.split(filepath)
+            sidecar_re = re.compile(
+                re.escape(basename) + r"\.\d+\.\d+" + re.escape(CACHE_SUFFIX)
+            )
+            for entry in os.scandir(dirpath or os.curdir):
+                if sidecar_re.fullmatch(entry.name):
+                    os.remove(entry.path)
+            # the sidecar holds the same contents, so it gets the same mode
+            _write_atomic(
+                cache_path,
+                pickle.dumps(data, pickle.HIGHEST_PROTOCOL),
+                durable=False,
+                mode=S_IMODE(st.st_mode),
+            )
+        except OSError as e:
+            _LOGGER.debug(f"Could not write cache file '{cache_path}': {e}")
+        return data
 
     def read_yaml_file(filepath):
         """
         Read a YAML file
 
+        The parsed contents are cached, keyed by the absolute path and the file
+        stats, so unchanged files are not re-parsed. Files modified too
+        recently to tell changes apart by their stats are not cached, see
+        _RACY_WINDOW_NS. A copy of the cached data is returned, so the cache is
+        not affected by changes made by callers. See `_copy_parsed` for why
+        this copy is cheaper than a deep copy.
+
         :param str filepath: path to the file to read
         :return dict: read data
         """
-        with open(filepath, "r") as f:
-            data = yaml.safe_load(f)
-        return data
+        st = os.stat(filepath)
+        key = (os.path.abspath(filepath), st.st_ino, st.st_mtime_ns, st.st_size)
+        with _YAML_CACHE_LOCK:
+            # files with no contents are cached as None, hence the sentinel
+            data = _YAML_CACHE.get(key, _CACHE_MISS)
+            if data is not _CACHE_MISS:
+                _YAML_CACHE.move_to_end(key)
+        if data is _CACHE_MISS:
+            if time_ns() - st.st_mtime_ns < _RACY_WINDOW_NS:
+                _LOGGER.debug(f"Not caching recently modified file: {filepath}")
+                return parse_yaml_file(filepath, st)
+            # parse outside of the lock, so other files can be read meanwhile
+            if cache:
+                data = read_cache_file(filepath, st)
+            else:
+                data = parse_yaml_file(filepath, st)
+            with _YAML_CACHE_LOCK:
+                _YAML_CACHE[key] = data
+                if len(_YAML_CACHE) > _YAML_CACHE_SIZE:
+                    _YAML_CACHE.popitem(last=False)
+        return _copy_parsed(data)
 
     if is_url(filepath):
         _LOGGER.debug(f"Got URL: {filepath}")
@@ -432,7 +879,7 @@ def load_yaml(filepath):
             raise e
         data = response.read()  # a `bytes` object
         text = data.decode("utf-8")
-        return yaml.safe_load(text)
+        return yaml.load(text, _YacmanLoader)
     else:
         return read_yaml_file(filepath)
 